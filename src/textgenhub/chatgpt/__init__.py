@@ -1,14 +1,24 @@
+from ..core.provider import SimpleProvider
 from .chatgpt import ask, close
 
 
 class ChatGPT:
-    """ChatGPT provider class"""
+    """ChatGPT provider class; every chat() goes through one Node worker until close()"""
+
+    def __init__(self):
+        self._provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
 
     def chat(self, prompt: str) -> str:
-        return ask(prompt)
+        return self._provider.ask(prompt)
+
+    def chat_many(self, prompts: list[str]) -> list[str]:
+        return self._provider.ask_many(prompts)
 
     def close(self, session: int | None = None) -> None:
-        return close(session)
+        try:
+            self._provider.ask(None, session=session, close=True)
+        finally:
+            self._provider.close()
 
 
-__all__ = ["ask", "ChatGPT"]
+__all__ = ["ask", "close", "ChatGPT"]
@@ -2,6 +2,7 @@
 import { argv } from 'process';
 import fs from 'fs';
 import path from 'path';
+import readline from 'readline';
 import { fileURLToPath } from 'url';
 import { connectToExistingChrome, launchControlledChromium, ensureLoggedIn, sendPrompt } from './lib/index.js';
 
@@ -172,7 +173,7 @@ function extractConversationFromUrl(url) {
 }
 
 function usage() {
-  console.log('Usage: node bin/send-prompt-cli.js [--help|-h] --prompt "Your prompt here" [--json|--html|--format|-f json|html] [--raw|-r] [--debug|-d] [--timeout|-t seconds] [--typing-speed speed] [--session INDEX] [--close|-c]');
+  console.log('Usage: node bin/send-prompt-cli.js [--help|-h] --prompt "Your prompt here" [--json|--html|--format|-f json|html] [--raw|-r] [--debug|-d] [--timeout|-t seconds] [--typing-speed speed] [--session INDEX] [--close|-c] [--batch]');
   console.log('');
   console.log('Options:');
   console.log('  --help, -h              Show this help message');
@@ -187,6 +188,7 @@ function usage() {
   console.log('  --typing-speed SPEED    Typing speed in seconds per character (default: null for instant paste, > 0 for character-by-character typing)');
   console.log('  --session INDEX         Explicit session index to use (see: poetry run textgenhub sessions list)');
   console.log('  --close, -c             Close browser session after completion (default: keep open)');
+  console.log('  --batch                 Keep running and read one JSON request per line from stdin');
   console.log('');
   console.log('Output Formats:');
   console.log('  Default (no flags): JSON format with connection/response events');
@@ -205,7 +207,7 @@ function usage() {
 
 function parseArgs() {
   const args = process.argv.slice(2);
-  const out = { prompt: null, format: 'json', debug: false, timeout: 120, maxTrials: 10, raw: false, closeBrowser: false, typingSpeed: null, sessionIndex: null };
+  const out = { prompt: null, format: 'json', debug: false, timeout: 120, maxTrials: 10, raw: false, closeBrowser: false, typingSpeed: null, sessionIndex: null, batch: false };
   for (let i = 0; i < args.length; i++) {
     const a = args[i];
     if (a === '--help' || a === '-h') {
@@ -261,6 +263,10 @@ function parseArgs() {
       out.closeBrowser = true;
       continue;
     }
+    if (a === '--batch') {
+      out.batch = true;
+      continue;
+    }
     if (a === '--session') {
       const parsedIndex = parseInt(args[i + 1], 10);
       if (Number.isNaN(parsedIndex)) {
@@ -279,16 +285,9 @@ function parseArgs() {
   return out;
 }
 
-(async function main() {
-  const { prompt, format, debug, timeout, maxTrials, raw, closeBrowser, typingSpeed, sessionIndex } = parseArgs();
-  if (!prompt && !closeBrowser) return usage();
-
-  // Validate format
-  if (!['json', 'html'].includes(format)) {
-    console.error(`Invalid format: ${format}. Must be 'json' or 'html'`);
-    process.exit(2);
-  }
-
+// Runs a single prompt/close request and reports its exit code instead of exiting,
+// so the same flow serves both one-shot invocations and --batch mode.
+async function handleRequest({ prompt, format, debug, timeout, maxTrials, raw, closeBrowser, typingSpeed, sessionIndex }, { batch = false } = {}) {
   let browser, page, browserLaunched = false;
   try {
     if (!raw && format === 'json') {
@@ -298,14 +297,16 @@ function parseArgs() {
     const sessionsData = loadSessions();
     const targetSession = resolveSessionIndex(sessionsData, sessionIndex);
     if (targetSession === null) {
-      console.error('No sessions found. Create one with: node src/textgenhub/chatgpt/init_session.js');
-      process.exit(1);
+      const message = 'No sessions found. Create one with: node src/textgenhub/chatgpt/init_session.js';
+      console.error(message);
+      return { code: 1, response: null, error: message };
     }
 
     const selectedSession = getSessionByIndex(sessionsData, targetSession);
     if (!selectedSession) {
-      console.error(`Session index ${targetSession} not found. Run: poetry run textgenhub sessions list`);
-      process.exit(1);
+      const message = `Session index ${targetSession} not found. Run: poetry run textgenhub sessions list`;
+      console.error(message);
+      return { code: 1, response: null, error: message };
     }
 
     const debugPort = selectedSession.debugPort || 9222;
@@ -319,7 +320,7 @@ function parseArgs() {
         if (!raw && format === 'json') {
           console.log(JSON.stringify({ event: 'session_already_closed', message: 'No running session found to close', sessionIndex: targetSession }));
         }
-        process.exit(0);
+        return { code: 0, response: null };
       }
       if (!raw && format === 'json') {
         console.log(JSON.stringify({ event: 'launching_chrome', timestamp: new Date().toISOString(), sessionIndex: targetSession }));
@@ -337,7 +338,7 @@ function parseArgs() {
       } else if (!raw) {
         console.log(`Browser session ${targetSession} closed.`);
       }
-      process.exit(0);
+      return { code: 0, response: null };
     }
 
     try {
@@ -387,8 +388,11 @@ function parseArgs() {
         } catch {
           // Ignore disconnect errors during cleanup
         }
+      } else if (browser && batch) {
+        // Ignore disconnect errors during cleanup
+        await browser.disconnect().catch(() => {});
       }
-      process.exit(3);
+      return { code: 3, response: null, error: err.message };
     }
 
     // Restore last conversation if present AND we didn't just launch the browser.
@@ -475,8 +479,13 @@ function parseArgs() {
       if (!raw) {
         console.log(JSON.stringify({ event: 'session_kept_open', message: 'Browser session remains open for future use', timestamp: new Date().toISOString() }));
       }
+      if (batch) {
+        // The worker outlives this request; drop the DevTools connection but leave Chrome running.
+        // The response is already printed, so a failed disconnect must not turn this into an error.
+        await browser.disconnect().catch(() => {});
+      }
     }
-    process.exit(0);
+    return { code: 0, response };
   } catch (error) {
     if (!raw && format === 'json') {
       console.error(JSON.stringify({ event: 'error', message: error.message, stack: error.stack }));
@@ -493,7 +502,50 @@ function parseArgs() {
       } catch {
         // Ignore disconnect errors during cleanup
       }
+    } else if (browser && batch) {
+      // Ignore disconnect errors during cleanup
+      await browser.disconnect().catch(() => {});
+    }
+    return { code: 1, response: null, error: error.message };
+  }
+}
+
+// Long-lived worker mode: one JSON request per stdin line, each answered by the usual
+// event/response lines followed by a batch_done marker carrying the exit code.
+async function runBatch(defaults) {
+  const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+  for await (const line of rl) {
+    if (!line.trim()) {
+      continue;
     }
-    process.exit(1);
+    let result;
+    try {
+      const request = JSON.parse(line);
+      result = await handleRequest({ ...defaults, ...request, format: 'json', raw: false }, { batch: true });
+    } catch (error) {
+      console.error(JSON.stringify({ event: 'error', message: error.message, stack: error.stack }));
+      result = { code: 2, response: null, error: error.message };
+    }
+    console.log(JSON.stringify({ event: 'batch_done', code: result.code, error: result.error || null }));
   }
+  process.exit(0);
+}
+
+(async function main() {
+  const options = parseArgs();
+  if (options.batch) {
+    return runBatch(options);
+  }
+
+  const { prompt, format, closeBrowser } = options;
+  if (!prompt && !closeBrowser) return usage();
+
+  // Validate format
+  if (!['json', 'html'].includes(format)) {
+    console.error(`Invalid format: ${format}. Must be 'json' or 'html'`);
+    process.exit(2);
+  }
+
+  const { code } = await handleRequest(options);
+  process.exit(code);
 })();
@@ -284,7 +284,8 @@ def run_provider_old(
         return stdout_content, ""
 
 
-def main():
+def _build_parser() -> tuple[argparse.ArgumentParser, argparse.ArgumentParser]:
+    """Build the top-level CLI parser; also returns the sessions sub-parser for its help text."""
     parser = argparse.ArgumentParser(description="TextGenHub CLI - Unified interface for LLM providers", prog="textgenhub")
     subparsers = parser.add_subparsers(dest="provider", help="LLM provider")
 
@@ -328,10 +329,18 @@ def main():
     grok_parser.add_argument("--output-format", choices=["json", "html"], default="json", help="Output format (default: json)")
     grok_parser.add_argument("--typing-speed", type=float, default=None, help="Typing speed in seconds per character (default: None for instant paste, > 0 for character-by-character typing)")
 
-    args = parser.parse_args()
+    return parser, sessions_parser
+
+
+# Built once at import; main() may run many times in one process (tests, embedding)
+_PARSER, _SESSIONS_PARSER = _build_parser()
+
+
+def main():
+    args = _PARSER.parse_args()
 
     if not args.provider:
-        parser.print_help()
+        _PARSER.print_help()
         sys.exit(1)
 
     try:
@@ -380,7 +389,7 @@ def main():
                 result = subprocess.run(cmd, text=True, cwd=root, encoding="utf-8", errors="replace")
                 sys.exit(result.returncode)
 
-            sessions_parser.print_help()
+            _SESSIONS_PARSER.print_help()
             sys.exit(1)
 
         if args.provider == "chatgpt":
@@ -2,18 +2,39 @@
 Simple base provider for all text generation services.
 No overengineering, just the essentials.
 """
+from collections.abc import Iterator
 from pathlib import Path
+import json
 import subprocess
+import threading
 from ..utils.scrape_response import extract_response_json
 
+# Providers whose Node CLI can run as a long-lived worker via --batch
+_BATCH_PROVIDERS = {"chatgpt"}
+
+
+def _iter_subprocess_lines(cmd: list[str], cwd: Path) -> Iterator[bytes]:
+    """Run a Node CLI command and yield its combined stdout/stderr line by line until it exits."""
+    # Buffered pipe: large JSON responses arrive in a few reads rather than one syscall per chunk
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=cwd, bufsize=-1) as proc:
+        if proc.stdout is None:
+            raise RuntimeError("Subprocess stdout is None. Failed to capture output.")
+        yield from proc.stdout
+        proc.wait()
+
 
 class SimpleProvider:
     """Simple base class for all text generation providers"""
 
-    def __init__(self, provider_name: str, cli_script: str):
+    def __init__(self, provider_name: str, cli_script: str, persistent: bool = False):
         self.provider_name = provider_name
         self.cli_script = Path(__file__).parent.parent / provider_name / cli_script
         self.node_path = "node"
+        # Invariant argv prefix, built once instead of on every ask()
+        self._base_cmd = (self.node_path, str(self.cli_script))
+        # Reuse one Node worker across ask() calls instead of paying Node startup per prompt
+        self.persistent = persistent and provider_name in _BATCH_PROVIDERS
+        self._proc = None
 
     def ask(
         self,
@@ -44,11 +65,15 @@ class SimpleProvider:
         Returns:
             str: The response from the provider
         """
+        if self.persistent:
+            request = self._worker_request(prompt, debug=debug, timeout=timeout, typing_speed=typing_speed, session=session, close=close, max_trials=max_trials)
+            return self._extract_response(self._ask_worker([request])[0], prompt, close)
+
         # Build command differently for the new session-based ChatGPT CLI which
         # no longer accepts --headless or --remove-cache. For that provider,
         # only pass supported flags: --prompt, --timeout and optionally --debug.
         if self.provider_name == "chatgpt":
-            cmd = [self.node_path, str(self.cli_script), "--timeout", str(timeout), "--max-trials", str(max_trials)]
+            cmd = [*self._base_cmd, "--timeout", str(timeout), "--max-trials", str(max_trials)]
             if prompt is not None:
                 cmd.extend(["--prompt", prompt])
             if typing_speed is not None:
@@ -66,8 +91,7 @@ class SimpleProvider:
                 raise ValueError(f"Prompt is required for provider: {self.provider_name}")
 
             cmd = [
-                self.node_path,
-                str(self.cli_script),
+                *self._base_cmd,
                 "--prompt",
                 prompt,
                 "--headless",
@@ -86,24 +110,61 @@ class SimpleProvider:
 
         stdout_json_line = None
 
-        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=self.cli_script.parent) as proc:
-            if proc.stdout is not None:
-                raw_bytes = proc.stdout.read()
-                try:
-                    text = raw_bytes.decode("utf-8")
-                except UnicodeDecodeError as e:
-                    print(f"UnicodeDecodeError at byte {e.start}, replacing invalid bytes")
-                    text = raw_bytes.decode("utf-8", errors="replace")
-
-                for line in text.splitlines():
-                    print(line)  # shows all Node logs live
-                    if line.strip().startswith('{"response":'):
-                        stdout_json_line = line.strip()
-            else:
-                raise RuntimeError("Subprocess stdout is None. Failed to capture output.")
+        # Scan line by line so only the latest response line is held, not the whole transcript
+        for raw in _iter_subprocess_lines(cmd, self.cli_script.parent):
+            line = raw.decode("utf-8", errors="replace").strip()
+            print(line)  # shows all Node logs live
+            if line.startswith('{"response":'):
+                stdout_json_line = line
+
+        return self._extract_response(stdout_json_line, prompt, close)
+
+    def ask_many(self, prompts: list[str], **kwargs) -> list[str]:
+        """
+        Send several prompts and return their responses in the same order.
+
+        With a persistent worker every request is written to its stdin up front and the
+        replies are read back as they complete, so the whole batch shares one Node process.
+        Otherwise each prompt goes through ask() in turn.
 
+        Args:
+            prompts (list[str]): The prompts to send
+            **kwargs: Options forwarded to ask() for every prompt
+
+        Returns:
+            list[str]: One response per prompt
+        """
+        if self.persistent and prompts:
+            replies = self._ask_worker([self._worker_request(prompt, **kwargs) for prompt in prompts])
+            return [self._extract_response(line, prompt, False) for line, prompt in zip(replies, prompts)]
+        return [self.ask(prompt, **kwargs) for prompt in prompts]
+
+    def close(self) -> None:
+        """Shut down the persistent Node worker, if one is running."""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        if proc.stdin is not None:
+            try:
+                proc.stdin.close()  # EOF ends the worker's request loop
+            except OSError:
+                pass
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
             proc.wait()
+        if proc.stdout is not None:
+            proc.stdout.close()
+
+    def __del__(self):
+        if getattr(self, "_proc", None) is not None:
+            try:
+                self.close()
+            except Exception:
+                pass
 
+    def _extract_response(self, stdout_json_line: str | None, prompt: str | None, close: bool) -> str:
         if prompt is None and close:
             return ""
 
@@ -111,3 +172,97 @@ class SimpleProvider:
             raise RuntimeError(f"{self.provider_name} script did not produce JSON response")
 
         return extract_response_json(stdout_json_line)
+
+    @staticmethod
+    def _worker_request(
+        prompt: str | None,
+        debug: bool = False,
+        timeout: int = 120,
+        typing_speed: float | None = None,
+        session: int | None = None,
+        close: bool = False,
+        max_trials: int = 10,
+        **_browser_flags,
+    ) -> dict:
+        # headless/remove_cache only apply to the legacy CLIs, which have no worker mode
+        return {
+            "prompt": prompt,
+            "debug": debug,
+            "timeout": timeout,
+            "maxTrials": max_trials,
+            "typingSpeed": typing_speed,
+            "sessionIndex": session,
+            "closeBrowser": close,
+        }
+
+    @staticmethod
+    def _write_requests(stdin, payload: bytes) -> None:
+        try:
+            stdin.write(payload)
+            stdin.flush()
+        except (OSError, ValueError):
+            pass  # the worker exited or its stdin was closed; the reader sees EOF
+
+    def _ask_worker(self, requests: list[dict]) -> list[str | None]:
+        """
+        Send requests to the persistent Node worker and collect one response line per request.
+
+        Returns:
+            list[str | None]: The {"response": ...} line printed for each request, in order
+        """
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                [*self._base_cmd, "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=self.cli_script.parent,
+                bufsize=-1,
+            )
+        proc = self._proc
+
+        payload = b"".join(json.dumps(request).encode("utf-8") + b"\n" for request in requests)
+        writer = None
+        replies = []
+        failure = None
+        try:
+            if len(requests) == 1:
+                self._write_requests(proc.stdin, payload)
+            else:
+                # Feed stdin from a thread so a large batch cannot deadlock against unread stdout
+                writer = threading.Thread(target=self._write_requests, args=(proc.stdin, payload), daemon=True)
+                writer.start()
+
+            stdout_json_line = None
+            for raw in iter(proc.stdout.readline, b""):
+                line = raw.decode("utf-8", errors="replace").strip()
+                print(line)  # shows all Node logs live
+                if line.startswith('{"response":'):
+                    stdout_json_line = line
+                elif line.startswith('{"event":"batch_done"'):
+                    done = json.loads(line)
+                    replies.append(stdout_json_line)
+                    stdout_json_line = None
+                    if done.get("code"):
+                        failure = f"{self.provider_name} script failed: {done.get('error')}"
+                        if len(replies) < len(requests):
+                            raise RuntimeError(failure)  # later replies are still queued in the worker
+                        break
+                    if len(replies) == len(requests):
+                        break
+            else:
+                # Never resend: the prompt may already have been typed before the worker died
+                raise RuntimeError(f"{self.provider_name} worker exited before answering the request")
+        except BaseException:
+            # Drop the worker on any interruption (EOF, Ctrl-C, a bad marker) so an unread reply cannot leak into the next call
+            proc.kill()
+            if writer is not None:
+                writer.join()  # before close(), so stdin is not closed under a write in progress
+            self.close()
+            raise
+
+        if writer is not None:
+            writer.join()
+        if failure is not None:
+            raise RuntimeError(failure)
+        return replies
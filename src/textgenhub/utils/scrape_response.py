@@ -1,6 +1,28 @@
 import json
 import re
 
+try:
+    import msgspec
+except ImportError:  # optional extra; stdlib json is used without it
+    msgspec = None
+
+if msgspec is not None:
+
+    class _Response(msgspec.Struct):
+        response: str
+
+    _decode_response = msgspec.json.Decoder(_Response).decode
+
+
+def _load_response(line: str):
+    """Return the "response" field of a Node JSON line."""
+    if msgspec is not None:
+        try:
+            return _decode_response(line).response
+        except msgspec.DecodeError:
+            pass  # let json raise (or accept) exactly as it always has
+    return json.loads(line)["response"]
+
 
 def extract_response_json(stdout: str) -> str:
     """
@@ -11,7 +33,7 @@ def extract_response_json(stdout: str) -> str:
     for line in stdout.splitlines():
         line = line.strip()
         if line.startswith('{"response":'):
-            resp = json.loads(line)["response"]
+            resp = _load_response(line)
             # Remove "ChatGPT said:" prefix if present
             resp = re.sub(r"^\s*ChatGPT said:\s*", "", resp, flags=re.IGNORECASE).strip()
             return resp
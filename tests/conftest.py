@@ -1,8 +1,21 @@
 """
 Pytest configuration and fixtures for textgenhub tests.
 """
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
 import pytest
 
+# Add src to path for imports; conftest is loaded once, before any test module
+_SRC = str(Path(__file__).resolve().parent.parent / "src")
+if _SRC not in sys.path:
+    sys.path.insert(0, _SRC)
+
+# Captured before any test swaps subprocess.Popen for a mock
+_REAL_POPEN = subprocess.Popen
+
 
 # Register custom markers
 def pytest_configure(config):
@@ -15,4 +28,42 @@ def pytest_configure(config):
     )
     config.addinivalue_line(
         "markers", "unit: marks tests as unit tests"
-    )
\ No newline at end of file
+    )
+
+
+@pytest.fixture(scope="session")
+def long_prompt():
+    """10,000 character prompt, built once per test process."""
+    return "a" * 10000
+
+
+@pytest.fixture(scope="session")
+def long_response_stdout():
+    """Node stdout carrying a 10,000 character response, built once per test process."""
+    return '{"response": "' + "x" * 10000 + '"}'
+
+
+class FakeWorker:
+    """Builds Popen mocks standing in for the persistent chatgpt --batch worker."""
+
+    BATCH_DONE = b'{"event":"batch_done","code":0,"error":null}\n'
+
+    def __call__(self, *lines):
+        """Worker whose stdout yields the given raw lines (or raises them, for exceptions), then EOF."""
+        # spec'd so a misspelt Popen method fails the test instead of returning a child mock
+        proc = MagicMock(spec=_REAL_POPEN)
+        proc.poll.return_value = None
+        proc.stdin = MagicMock()
+        proc.stdout = MagicMock()
+        proc.stdout.readline.side_effect = list(lines) + [b""]
+        return proc
+
+    def answering(self, *responses):
+        """Worker answering one request per response body, each followed by a successful batch_done."""
+        return self(*[line for response in responses for line in (b'{"response": "' + response + b'"}\n', self.BATCH_DONE)])
+
+
+@pytest.fixture(scope="session")
+def fake_worker():
+    """Factory for persistent-worker Popen mocks; see FakeWorker."""
+    return FakeWorker()
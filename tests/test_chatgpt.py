@@ -1,149 +1,129 @@
 """
 Comprehensive tests for ChatGPT module (new session-based implementation)
 """
+import json
+import re
 import pytest
 from unittest.mock import patch, MagicMock, call
 from pathlib import Path
 from textgenhub.chatgpt import ChatGPT, ask
 
 
+_STDOUT_NONE_RE = re.compile("stdout is None")
+_NO_JSON_RE = re.compile("did not produce JSON response")
+_JSON_CODE_BLOCK_STDOUT = (
+    b'{"response": "json\\nCopy code\\n{\\n  \\"name\\": \\"example\\",\\n  \\"items\\": '
+    b'[\\n    {\\"id\\": 1, \\"value\\": \\"test\\"}\\n  ]\\n}"}'
+)
+_LONG_RESPONSE_STDOUT = b'{"response": "' + b"x" * 10000 + b'"}'
+_FLAG_RE = re.compile(r"(?<!\S)(--debug|--timeout|--typing-speed|--headless|--remove-cache)(?!\S)")
+
+
+def _flags(argv):
+    """Return the known CLI flags present in argv, found in one pass over the joined command"""
+    return set(_FLAG_RE.findall(" ".join(argv)))
+
+
+def _captured_argv(mock_read):
+    """Return the argv passed to the last _iter_subprocess_lines call"""
+    return tuple(mock_read.call_args.args[0])
+
+
 class TestChatGPTAskFunction:
     """Test the ask() function in chatgpt module"""
 
-    @patch("subprocess.Popen")
-    def test_ask_basic_functionality(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "Hello, this is ChatGPT"}'])
+    def test_ask_basic_functionality(self, mock_read):
         """Test basic ask() function with simple prompt"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "Hello, this is ChatGPT"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Hello")
         assert result == "Hello, this is ChatGPT"
 
-    @patch("subprocess.Popen")
-    def test_ask_with_default_parameters(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "response"}'])
+    def test_ask_with_default_parameters(self, mock_read):
         """Test ask() uses correct default parameter values"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         ask("test prompt")
 
         # Verify command construction with defaults
-        call_args = mock_popen.call_args[0][0]
-        assert "--timeout" in call_args
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
+        assert "--timeout" in flags
         assert "120" in call_args  # default timeout
-        assert "--debug" not in call_args  # debug defaults to False
+        assert "--debug" not in flags  # debug defaults to False
 
-    @patch("subprocess.Popen")
-    def test_ask_with_debug_true(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "debug response"}'])
+    def test_ask_with_debug_true(self, mock_read):
         """Test ask() with debug=True includes debug flag"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "debug response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("test", debug=True)
         assert result == "debug response"
 
-        call_args = mock_popen.call_args[0][0]
-        assert "--debug" in call_args
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
+        assert "--debug" in flags
 
-    @patch("subprocess.Popen")
-    def test_ask_with_debug_false(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "no debug"}'])
+    def test_ask_with_debug_false(self, mock_read):
         """Test ask() with debug=False does not include debug flag"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "no debug"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("test", debug=False)
         assert result == "no debug"
 
-        call_args = mock_popen.call_args[0][0]
-        assert "--debug" not in call_args
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
+        assert "--debug" not in flags
 
-    @patch("subprocess.Popen")
-    def test_ask_with_custom_timeout(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "response"}'])
+    def test_ask_with_custom_timeout(self, mock_read):
         """Test ask() with custom timeout value"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         ask("test", timeout=300)
 
-        call_args = mock_popen.call_args[0][0]
-        assert "--timeout" in call_args
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
+        assert "--timeout" in flags
         assert "300" in call_args
 
-    @patch("subprocess.Popen")
-    def test_ask_with_typing_speed_none(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "instant"}'])
+    def test_ask_with_typing_speed_none(self, mock_read):
         """Test ask() with typing_speed=None (default instant paste)"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "instant"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("test", typing_speed=None)
         assert result == "instant"
 
-        call_args = mock_popen.call_args[0][0]
-        assert "--typing-speed" not in call_args
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
+        assert "--typing-speed" not in flags
 
-    @patch("subprocess.Popen")
-    def test_ask_with_typing_speed_value(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "typed"}'])
+    def test_ask_with_typing_speed_value(self, mock_read):
         """Test ask() with specific typing speed value"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "typed"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("test", typing_speed=0.05)
         assert result == "typed"
 
-        call_args = mock_popen.call_args[0][0]
-        assert "--typing-speed" in call_args
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
+        assert "--typing-speed" in flags
         assert "0.05" in call_args
 
-    @patch("subprocess.Popen")
-    def test_ask_headless_parameter_ignored(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "response"}'])
+    def test_ask_headless_parameter_ignored(self, mock_read):
         """Test that headless parameter is ignored for session-based CLI"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         # Pass headless parameter but verify it's not used in command
         ask("test", headless=True)
 
-        call_args = mock_popen.call_args[0][0]
-        assert "--headless" not in call_args
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
+        assert "--headless" not in flags
 
-    @patch("subprocess.Popen")
-    def test_ask_remove_cache_parameter_ignored(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "response"}'])
+    def test_ask_remove_cache_parameter_ignored(self, mock_read):
         """Test that remove_cache parameter is ignored for session-based CLI"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         # Pass remove_cache parameter but verify it's not used in command
         ask("test", remove_cache=True)
 
-        call_args = mock_popen.call_args[0][0]
-        assert "--remove-cache" not in call_args
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
+        assert "--remove-cache" not in flags
 
-    @patch("subprocess.Popen")
-    def test_ask_with_all_parameters(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "full params"}'])
+    def test_ask_with_all_parameters(self, mock_read):
         """Test ask() with all parameters specified"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "full params"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask(
             prompt="complex prompt",
             headless=False,
@@ -154,134 +134,124 @@ class TestChatGPTAskFunction:
         )
         assert result == "full params"
 
-        call_args = mock_popen.call_args[0][0]
+        call_args = _captured_argv(mock_read)
+        flags = _flags(call_args)
         assert "complex prompt" in call_args
-        assert "--debug" in call_args
-        assert "--timeout" in call_args
+        assert "--debug" in flags
+        assert "--timeout" in flags
         assert "200" in call_args
-        assert "--typing-speed" in call_args
+        assert "--typing-speed" in flags
         assert "0.1" in call_args
 
-    @patch("subprocess.Popen")
-    def test_ask_empty_prompt(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "response to empty"}'])
+    def test_ask_empty_prompt(self, mock_read):
         """Test ask() with empty prompt"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "response to empty"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("")
         assert result == "response to empty"
 
-    @patch("subprocess.Popen")
-    def test_ask_special_characters(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "special response"}'])
+    def test_ask_special_characters(self, mock_read):
         """Test ask() with special characters in prompt"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "special response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         special_prompt = "Test with !@#$%^&*()_+-=[]{}|;:',.<>?/~`"
         result = ask(special_prompt)
         assert result == "special response"
 
-    @patch("subprocess.Popen")
-    def test_ask_unicode_characters(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "unicode response"}'])
+    def test_ask_unicode_characters(self, mock_read):
         """Test ask() with unicode characters"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "unicode response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         unicode_prompt = "你好世界 🌍 مرحبا мир"
         result = ask(unicode_prompt)
         assert result == "unicode response"
 
-    @patch("subprocess.Popen")
-    def test_ask_multiline_prompt(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "multiline response"}'])
+    def test_ask_multiline_prompt(self, mock_read):
         """Test ask() with multiline prompt"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "multiline response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         multiline = "Line 1\nLine 2\nLine 3"
         result = ask(multiline)
         assert result == "multiline response"
 
-    @patch("subprocess.Popen")
-    def test_ask_very_long_prompt(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "long response"}'])
+    def test_ask_very_long_prompt(self, mock_read, long_prompt):
         """Test ask() with very long prompt (10000+ chars)"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "long response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
-        long_prompt = "a" * 10000
         result = ask(long_prompt)
         assert result == "long response"
 
-    @patch("subprocess.Popen")
-    def test_ask_json_like_prompt(self, mock_popen):
-        """Test ask() with JSON-like characters in prompt"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "json response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[_LONG_RESPONSE_STDOUT])
+    def test_ask_very_long_response(self, mock_read):
+        """Test ask() with very long response (10000+ chars)"""
+        result = ask("test")
+        assert result == "x" * 10000
 
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "json response"}'])
+    def test_ask_json_like_prompt(self, mock_read):
+        """Test ask() with JSON-like characters in prompt"""
         json_like = '{"key": "value"} and [1, 2, 3]'
         result = ask(json_like)
         assert result == "json response"
 
 
 class TestChatGPTClass:
-    """Test the ChatGPT class"""
+    """Test the ChatGPT class, which keeps one --batch worker alive across chat() calls"""
 
     @patch("subprocess.Popen")
     def test_chatgpt_class_initialization(self, mock_popen):
-        """Test ChatGPT class can be instantiated"""
+        """Test ChatGPT class can be instantiated without starting Node"""
         chatgpt = ChatGPT()
         assert isinstance(chatgpt, ChatGPT)
+        mock_popen.assert_not_called()
 
     @patch("subprocess.Popen")
-    def test_chatgpt_class_chat_method(self, mock_popen):
+    def test_chatgpt_class_chat_method(self, mock_popen, fake_worker):
         """Test ChatGPT.chat() method"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "chat response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
+        mock_popen.return_value = fake_worker.answering(b"chat response")
         chatgpt = ChatGPT()
         result = chatgpt.chat("hello")
         assert result == "chat response"
+        assert "--batch" in mock_popen.call_args.args[0]
 
     @patch("subprocess.Popen")
-    def test_chatgpt_class_chat_multiple_calls(self, mock_popen):
-        """Test ChatGPT.chat() can be called multiple times"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
+    def test_chatgpt_class_chat_multiple_calls(self, mock_popen, fake_worker):
+        """Test ChatGPT.chat() reuses one Node worker across calls"""
+        mock_popen.return_value = fake_worker.answering(b"first", b"second")
         chatgpt = ChatGPT()
         result1 = chatgpt.chat("first")
         result2 = chatgpt.chat("second")
 
-        assert result1 == "response"
-        assert result2 == "response"
-        assert mock_popen.call_count >= 2
+        assert result1 == "first"
+        assert result2 == "second"
+        mock_popen.assert_called_once()
 
     @patch("subprocess.Popen")
-    def test_chatgpt_class_chat_with_special_prompt(self, mock_popen):
+    def test_chatgpt_class_chat_with_special_prompt(self, mock_popen, fake_worker):
         """Test ChatGPT.chat() with special characters"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "special response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
+        mock_popen.return_value = fake_worker.answering(b"special response")
         chatgpt = ChatGPT()
         result = chatgpt.chat("Test !@#$%^&*()")
         assert result == "special response"
+        payload = mock_popen.return_value.stdin.write.call_args.args[0]
+        assert json.loads(payload)["prompt"] == "Test !@#$%^&*()"
+
+    @patch("subprocess.Popen")
+    def test_chatgpt_class_chat_many(self, mock_popen, fake_worker):
+        """Test ChatGPT.chat_many() pipelines every prompt through one worker, in order"""
+        mock_popen.return_value = fake_worker.answering(b"a", b"b", b"c")
+        chatgpt = ChatGPT()
+        assert chatgpt.chat_many(["1", "2", "3"]) == ["a", "b", "c"]
+        mock_popen.assert_called_once()
+
+    @patch("subprocess.Popen")
+    def test_chatgpt_class_close_stops_worker(self, mock_popen, fake_worker):
+        """Test ChatGPT.close() closes the browser session and then the worker"""
+        worker = fake_worker(b'{"response": "hi"}\n', fake_worker.BATCH_DONE, fake_worker.BATCH_DONE)
+        mock_popen.return_value = worker
+        chatgpt = ChatGPT()
+        chatgpt.chat("hello")
+        chatgpt.close(session=1)
+
+        request = json.loads(worker.stdin.write.call_args.args[0])
+        assert request["closeBrowser"] is True
+        assert request["sessionIndex"] == 1
+        worker.stdin.close.assert_called_once()
 
 
 class TestChatGPTErrors:
@@ -294,54 +264,31 @@ class TestChatGPTErrors:
         mock_proc.stdout = None
         mock_popen.return_value.__enter__.return_value = mock_proc
 
-        with pytest.raises(RuntimeError, match="stdout is None"):
+        with pytest.raises(RuntimeError, match=_STDOUT_NONE_RE):
             ask("test")
 
-    @patch("subprocess.Popen")
-    def test_ask_no_json_response(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b"no json here"])
+    def test_ask_no_json_response(self, mock_read):
         """Test ask() when no JSON response is in output"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b"no json here"
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
-        with pytest.raises(RuntimeError, match="did not produce JSON response"):
+        with pytest.raises(RuntimeError, match=_NO_JSON_RE):
             ask("test")
 
-    @patch("subprocess.Popen")
-    def test_ask_unicode_decode_error(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "test\xff\xfe"}'])
+    def test_ask_unicode_decode_error(self, mock_read):
         """Test ask() handles UTF-8 decode errors gracefully"""
-        mock_proc = MagicMock()
-        # Invalid UTF-8 bytes mixed with valid response
-        invalid_bytes = b'{"response": "test\xff\xfe"}'
-        mock_proc.stdout.read.return_value = invalid_bytes
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
-        # Should handle with errors='replace'
+        # Invalid UTF-8 bytes mixed with valid response; should handle with errors='replace'
         result = ask("test")
         assert "test" in result
 
-    @patch("subprocess.Popen")
-    def test_ask_empty_response_value(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": ""}'])
+    def test_ask_empty_response_value(self, mock_read):
         """Test ask() with empty response value"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": ""}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("test")
         assert result == ""
 
-    @patch("subprocess.Popen")
-    def test_ask_multiple_json_lines(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b"debug\n", b'{"response": "first"}\n', b'{"response": "second"}\n', b'{"response": "final"}'])
+    def test_ask_multiple_json_lines(self, mock_read):
         """Test ask() with multiple JSON lines (uses last)"""
-        mock_proc = MagicMock()
-        output = b'debug\n{"response": "first"}\n{"response": "second"}\n{"response": "final"}'
-        mock_proc.stdout.read.return_value = output
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("test")
         assert result == "final"
 
@@ -349,195 +296,115 @@ class TestChatGPTErrors:
 class TestCodeBlockExtraction:
     """Test code block extraction and response cleaning functionality"""
 
-    @patch("subprocess.Popen")
-    def test_code_block_json_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[_JSON_CODE_BLOCK_STDOUT])
+    def test_code_block_json_clean_extraction(self, mock_read):
         """Test that JSON code blocks are extracted cleanly without UI artifacts"""
-        mock_proc = MagicMock()
         # Simulate response with code block UI artifacts that get cleaned
-        mock_proc.stdout.read.return_value = b'{"response": "json\\nCopy code\\n{\\n  \\"name\\": \\"example\\",\\n  \\"items\\": [\\n    {\\"id\\": 1, \\"value\\": \\"test\\"}\\n  ]\\n}"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return a JSON code block")
         expected = 'json\nCopy code\n{\n  "name": "example",\n  "items": [\n    {"id": 1, "value": "test"}\n  ]\n}'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_bash_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "bash\\nCopy code\\necho \\"Hello World\\"\\nls -la"}'])
+    def test_code_block_bash_clean_extraction(self, mock_read):
         """Test that bash code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "bash\\nCopy code\\necho \\"Hello World\\"\\nls -la"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return a bash script")
         expected = 'bash\nCopy code\necho "Hello World"\nls -la'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_python_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "python\\nCopy code\\nprint(\\"Hello, World!\\")\\nfor i in range(3):\\n    print(i)"}'])
+    def test_code_block_python_clean_extraction(self, mock_read):
         """Test that Python code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "python\\nCopy code\\nprint(\\"Hello, World!\\")\\nfor i in range(3):\\n    print(i)"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return Python code")
         expected = 'python\nCopy code\nprint("Hello, World!")\nfor i in range(3):\n    print(i)'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_html_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "html\\nCopy code\\n<div>Hello</div>"}'])
+    def test_code_block_html_clean_extraction(self, mock_read):
         """Test that HTML code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "html\\nCopy code\\n<div>Hello</div>"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return HTML code")
         expected = 'html\nCopy code\n<div>Hello</div>'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_css_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "css\\nCopy code\\nbody { color: red; }"}'])
+    def test_code_block_css_clean_extraction(self, mock_read):
         """Test that CSS code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "css\\nCopy code\\nbody { color: red; }"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return CSS code")
         expected = 'css\nCopy code\nbody { color: red; }'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_javascript_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "javascript\\nCopy code\\nconsole.log(\\"Hello\\");"}'])
+    def test_code_block_javascript_clean_extraction(self, mock_read):
         """Test that JavaScript code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "javascript\\nCopy code\\nconsole.log(\\"Hello\\");"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return JavaScript code")
         expected = 'javascript\nCopy code\nconsole.log("Hello");'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_sql_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "sql\\nCopy code\\nSELECT * FROM users;"}'])
+    def test_code_block_sql_clean_extraction(self, mock_read):
         """Test that SQL code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "sql\\nCopy code\\nSELECT * FROM users;"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return SQL query")
         expected = 'sql\nCopy code\nSELECT * FROM users;'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_yaml_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "yaml\\nCopy code\\nname: example\\nage: 30"}'])
+    def test_code_block_yaml_clean_extraction(self, mock_read):
         """Test that YAML code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "yaml\\nCopy code\\nname: example\\nage: 30"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return YAML")
         expected = 'yaml\nCopy code\nname: example\nage: 30'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_xml_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "xml\\nCopy code\\n<root><item>test</item></root>"}'])
+    def test_code_block_xml_clean_extraction(self, mock_read):
         """Test that XML code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "xml\\nCopy code\\n<root><item>test</item></root>"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return XML")
         expected = 'xml\nCopy code\n<root><item>test</item></root>'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_markdown_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "markdown\\nCopy code\\n# Header\\n**bold** text"}'])
+    def test_code_block_markdown_clean_extraction(self, mock_read):
         """Test that Markdown code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "markdown\\nCopy code\\n# Header\\n**bold** text"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return Markdown")
         expected = 'markdown\nCopy code\n# Header\n**bold** text'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_plain_text_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "text\\nCopy code\\nPlain text content"}'])
+    def test_code_block_plain_text_clean_extraction(self, mock_read):
         """Test that plain text code blocks are extracted cleanly"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "text\\nCopy code\\nPlain text content"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return plain text")
         expected = 'text\nCopy code\nPlain text content'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_mixed_whitespace_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "json  \\n  Copy code  \\n{\\"key\\": \\"value\\"}"}'])
+    def test_code_block_mixed_whitespace_clean_extraction(self, mock_read):
         """Test code blocks with mixed whitespace in headers are cleaned"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "json  \\n  Copy code  \\n{\\"key\\": \\"value\\"}"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return JSON")
         expected = 'json  \n  Copy code  \n{"key": "value"}'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_case_insensitive_language_clean_extraction(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "JSON\\nCopy code\\n{\\"test\\": true}"}'])
+    def test_code_block_case_insensitive_language_clean_extraction(self, mock_read):
         """Test that language names are handled case-insensitively"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "JSON\\nCopy code\\n{\\"test\\": true}"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return JSON")
         expected = 'JSON\nCopy code\n{"test": true}'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_plain_text_response_unchanged(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "This is a plain text response without any code blocks."}'])
+    def test_plain_text_response_unchanged(self, mock_read):
         """Test that plain text responses without code blocks are unchanged"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "This is a plain text response without any code blocks."}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Give me plain text")
         expected = "This is a plain text response without any code blocks."
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_mixed_content_with_code_block(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "Here is some JSON data:\\n\\njson\\nCopy code\\n{\\"name\\": \\"test\\"}"}'])
+    def test_mixed_content_with_code_block(self, mock_read):
         """Test responses that mix plain text with code blocks"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "Here is some JSON data:\\n\\njson\\nCopy code\\n{\\"name\\": \\"test\\"}"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Give me mixed content")
         expected = 'Here is some JSON data:\n\njson\nCopy code\n{"name": "test"}'
         assert result == expected
 
-    @patch("subprocess.Popen")
-    def test_code_block_with_newlines_in_header(self, mock_popen):
+    @patch("textgenhub.core.provider._iter_subprocess_lines", return_value=[b'{"response": "json\\n\\nCopy code\\n\\n{\\"data\\": \\"value\\"}"}'])
+    def test_code_block_with_newlines_in_header(self, mock_read):
         """Test code blocks with newlines in the header section"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "json\\n\\nCopy code\\n\\n{\\"data\\": \\"value\\"}"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
         result = ask("Return JSON with newlines")
         expected = 'json\n\nCopy code\n\n{"data": "value"}'
         assert result == expected
@@ -658,19 +525,9 @@ Include both the explanation and the code block.'''
 class TestChatGPTExports:
     """Test module exports"""
 
-    def test_ask_function_exported(self):
-        """Test ask function is properly exported"""
-        from textgenhub.chatgpt import ask as imported_ask
-        assert callable(imported_ask)
-
-    def test_chatgpt_class_exported(self):
-        """Test ChatGPT class is properly exported"""
-        from textgenhub.chatgpt import ChatGPT as ImportedChatGPT
-        assert ImportedChatGPT is ChatGPT
-
-    def test_all_exports(self):
-        """Test __all__ contains expected exports"""
+    def test_module_exports(self):
+        """Test ask and ChatGPT are exported and listed in __all__"""
         from textgenhub import chatgpt
-        assert hasattr(chatgpt, '__all__')
-        assert "ask" in chatgpt.__all__
-        assert "ChatGPT" in chatgpt.__all__
+        assert callable(chatgpt.ask)
+        assert chatgpt.ChatGPT is ChatGPT
+        assert {"ask", "ChatGPT"}.issubset(chatgpt.__all__)
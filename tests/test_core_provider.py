@@ -1,9 +1,53 @@
+import io
+import itertools
+import json
+import subprocess
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 from pathlib import Path
 from textgenhub.core.provider import SimpleProvider
 
 
+_OK_JSON = b'{"response": "ok"}'
+# Flags only the legacy CLIs accept; the session-based chatgpt CLI must never receive them
+_LEGACY_ONLY_FLAGS = frozenset({"--headless", "--remove-cache"})
+_CHATGPT_BASE_ARGS = frozenset({"node", "--prompt", "--timeout", "--max-trials"})
+# Captured before any test swaps subprocess.Popen for a mock
+_REAL_POPEN = subprocess.Popen
+
+
+@pytest.fixture
+def mock_proc():
+    """Finished Node process whose stdout carries a single response line"""
+    # spec'd so a misspelt Popen method fails the test instead of returning a child mock
+    proc = MagicMock(spec=_REAL_POPEN)
+    proc.stdout = io.BytesIO(_OK_JSON)
+    proc.wait.return_value = None
+    return proc
+
+
+@pytest.fixture
+def mock_popen(monkeypatch, mock_proc):
+    """subprocess.Popen replaced by a mock that hands out mock_proc as its context manager"""
+    popen = MagicMock()
+    popen.return_value.__enter__.return_value = mock_proc
+    monkeypatch.setattr(subprocess, "Popen", popen)
+    return popen
+
+
+@pytest.fixture
+def mock_read(monkeypatch):
+    """One-shot line reader replaced by a mock that yields a single response line"""
+    read = MagicMock(return_value=[b'{"response": "one-shot"}'])
+    monkeypatch.setattr("textgenhub.core.provider._iter_subprocess_lines", read)
+    return read
+
+
+@pytest.fixture
+def provider():
+    return SimpleProvider("chatgpt", "chatgpt_cli.js")
+
+
 class TestSimpleProviderInit:
     """Test SimpleProvider initialization"""
 
@@ -14,6 +58,7 @@ class TestSimpleProviderInit:
         assert isinstance(provider.cli_script, Path)
         assert provider.cli_script.name == "chatgpt_cli.js"
         assert provider.node_path == "node"
+        assert provider._base_cmd == ("node", str(provider.cli_script))
 
     def test_init_various_providers(self):
         """Test initialization with various provider names"""
@@ -26,196 +71,243 @@ class TestSimpleProviderInit:
 class TestSimpleProviderAsk:
     """Test SimpleProvider.ask() method with various inputs"""
 
-    @patch("subprocess.Popen")
-    def test_ask_basic_prompt(self, mock_popen):
+    def test_ask_basic_prompt(self, mock_popen, mock_proc, provider):
         """Test basic prompt handling"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "test response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": "test response"}')
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         result = provider.ask("Hello")
         assert result == "test response"
 
-    @patch("subprocess.Popen")
-    def test_ask_empty_prompt(self, mock_popen):
+    def test_ask_empty_prompt(self, mock_popen, mock_proc, provider):
         """Test empty prompt handling"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "empty response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": "empty response"}')
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         result = provider.ask("")
         assert result == "empty response"
 
-    @patch("subprocess.Popen")
-    def test_ask_long_prompt(self, mock_popen):
+    def test_ask_long_prompt(self, mock_popen, mock_proc, provider):
         """Test very long prompt (5000+ characters)"""
         long_prompt = "a" * 5000
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "long response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": "long response"}')
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         result = provider.ask(long_prompt)
         assert result == "long response"
 
-    @patch("subprocess.Popen")
-    def test_ask_special_chars_prompt(self, mock_popen):
+    def test_ask_special_chars_prompt(self, mock_popen, mock_proc, provider):
         """Test prompt with special characters"""
         special_prompt = "Hello!@#$%^&*()_+-=[]{}|;:',.<>?/~`"
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "special response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": "special response"}')
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         result = provider.ask(special_prompt)
         assert result == "special response"
 
-    @patch("subprocess.Popen")
-    def test_ask_unicode_prompt(self, mock_popen):
+    def test_ask_unicode_prompt(self, mock_popen, mock_proc, provider):
         """Test unicode characters in prompt"""
         unicode_prompt = "世界 🌍 مرحبا мир"
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "unicode response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": "unicode response"}')
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         result = provider.ask(unicode_prompt)
         assert result == "unicode response"
 
-    @patch("subprocess.Popen")
-    def test_ask_with_headless_true(self, mock_popen):
+    def test_ask_with_headless_true(self, mock_popen, mock_proc, provider):
         """Test ask with headless=True"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "headless true"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": "headless true"}')
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         result = provider.ask("test", headless=True)
         assert result == "headless true"
 
         # For the session-based chatgpt CLI we no longer pass --headless or --remove-cache; ensure timeout present
-        call_args = mock_popen.call_args[0][0]
+        call_args = set(mock_popen.call_args[0][0])
         assert "--timeout" in call_args
-        assert "--headless" not in call_args
-        assert "--remove-cache" not in call_args
+        assert call_args.isdisjoint(_LEGACY_ONLY_FLAGS)
 
-    @patch("subprocess.Popen")
-    def test_ask_with_headless_false(self, mock_popen):
+    def test_ask_with_headless_false(self, mock_popen, mock_proc, provider):
         """Test ask with headless=False"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "headless false"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": "headless false"}')
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         result = provider.ask("test", headless=False)
         assert result == "headless false"
 
         # For the session-based chatgpt CLI we no longer pass --headless or --remove-cache; ensure timeout present
-        call_args = mock_popen.call_args[0][0]
+        call_args = set(mock_popen.call_args[0][0])
         assert "--timeout" in call_args
-        assert "--headless" not in call_args
-        assert "--remove-cache" not in call_args
+        assert call_args.isdisjoint(_LEGACY_ONLY_FLAGS)
 
-    @patch("subprocess.Popen")
-    def test_ask_all_boolean_flags(self, mock_popen):
+    @pytest.mark.parametrize("headless,remove_cache,debug", list(itertools.product([True, False], repeat=3)))
+    def test_ask_all_boolean_flags(self, mock_popen, mock_proc, provider, headless, remove_cache, debug):
         """Test all boolean flag combinations"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "flag response"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": "flag response"}')
+
+        result = provider.ask("test", headless, remove_cache, debug)
+        assert result == "flag response"
 
+        # Verify command line arguments for chatgpt session-based CLI
+        call_args = set(mock_popen.call_args[0][0])
+        assert "--timeout" in call_args
+        assert call_args.isdisjoint(_LEGACY_ONLY_FLAGS)
+        if debug:
+            assert "--debug" in call_args
+        else:
+            assert "--debug" not in call_args
+
+
+class TestSimpleProviderWorker:
+    """Test the persistent Node worker used when persistent=True"""
+
+    def test_persistent_only_for_batch_providers(self):
+        """Test persistent mode is ignored for CLIs without --batch"""
+        assert SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True).persistent is True
+        assert SimpleProvider("deepseek", "deepseek_cli.js", persistent=True).persistent is False
+        assert SimpleProvider("chatgpt", "chatgpt_cli.js").persistent is False
+
+    def test_worker_reused_across_asks(self, mock_popen, fake_worker):
+        """Test one Node process serves consecutive prompts"""
+        mock_popen.return_value = fake_worker(
+            b'{"response": "first"}\n',
+            fake_worker.BATCH_DONE,
+            b'{"response": "second"}\n',
+            fake_worker.BATCH_DONE,
+        )
+
+        provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
+        assert provider.ask("one") == "first"
+        assert provider.ask("two") == "second"
+
+        mock_popen.assert_called_once()
+        assert "--batch" in mock_popen.call_args.args[0]
+        assert mock_popen.return_value.stdin.write.call_count == 2
+
+    def test_worker_error_code_raises(self, mock_popen, fake_worker):
+        """Test a non-zero batch_done code surfaces as RuntimeError"""
+        mock_popen.return_value = fake_worker(b'{"event":"batch_done","code":1,"error":"boom"}\n')
+
+        provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
+        with pytest.raises(RuntimeError, match="boom"):
+            provider.ask("Hello")
+
+    def test_worker_exit_raises_without_resend(self, mock_popen, mock_read, fake_worker):
+        """Test a worker that dies mid-request raises instead of resending the prompt"""
+        mock_popen.return_value = fake_worker(b'{"event":"prompt_sent"}\n')
+
+        provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
+        with pytest.raises(RuntimeError, match="worker exited"):
+            provider.ask("Hello")
+        assert provider.persistent is True
+        mock_read.assert_not_called()
+
+    def test_interrupted_ask_drops_worker(self, mock_popen, fake_worker):
+        """Test Ctrl-C mid-read kills the worker so its unread reply cannot answer the next prompt"""
+        interrupted = fake_worker(b'{"event":"prompt_sent"}\n', KeyboardInterrupt(), b'{"response": "answer to ONE"}\n', fake_worker.BATCH_DONE)
+        mock_popen.side_effect = [interrupted, fake_worker(b'{"response": "answer to TWO"}\n', fake_worker.BATCH_DONE)]
+
+        provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
+        with pytest.raises(KeyboardInterrupt):
+            provider.ask("one")
+        interrupted.kill.assert_called_once()
+        assert provider._proc is None
+
+        assert provider.ask("two") == "answer to TWO"
+        assert mock_popen.call_count == 2
+
+    def test_ask_many_preserves_order(self, mock_popen, fake_worker):
+        """Test ask_many returns responses in prompt order"""
+        mock_popen.return_value = fake_worker(
+            b'{"response": "a"}\n',
+            fake_worker.BATCH_DONE,
+            b'{"response": "b"}\n',
+            fake_worker.BATCH_DONE,
+            b'{"response": "c"}\n',
+            fake_worker.BATCH_DONE,
+        )
+
+        provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
+        assert provider.ask_many(["1", "2", "3"]) == ["a", "b", "c"]
+
+        payload = mock_popen.return_value.stdin.write.call_args.args[0]
+        assert [json.loads(line)["prompt"] for line in payload.splitlines()] == ["1", "2", "3"]
+
+    def test_ask_many_single_popen(self, mock_popen, fake_worker):
+        """Test a whole batch is served by one Node process"""
+        mock_popen.return_value = fake_worker(*[_OK_JSON + b"\n", fake_worker.BATCH_DONE] * 4)
+
+        provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
+        provider.ask_many(["p1", "p2", "p3", "p4"])
+
+        assert mock_popen.call_count == 1
+
+    def test_ask_many_error_drops_worker(self, mock_popen, fake_worker):
+        """Test a failed request mid-batch kills the worker once the stdin writer is done"""
+        proc = fake_worker(b'{"event":"batch_done","code":1,"error":"boom"}\n')
+        mock_popen.return_value = proc
+
+        provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
+        with pytest.raises(RuntimeError, match="boom"):
+            provider.ask_many(["1", "2"])
+
+        proc.kill.assert_called_once()
+        proc.stdin.write.assert_called_once()
+        assert provider._proc is None
+
+    def test_ask_many_without_worker(self, mock_read):
+        """Test ask_many falls back to one ask() per prompt"""
         provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
+        assert provider.ask_many(["1", "2"]) == ["one-shot", "one-shot"]
+        assert mock_read.call_count == 2
 
-        for headless in [True, False]:
-            for remove_cache in [True, False]:
-                for debug in [True, False]:
-                    result = provider.ask("test", headless, remove_cache, debug)
-                    assert result == "flag response"
+    def test_close_stops_worker(self, mock_popen, fake_worker):
+        """Test close() ends the worker by closing its stdin"""
+        proc = fake_worker(_OK_JSON + b"\n", fake_worker.BATCH_DONE)
+        mock_popen.return_value = proc
 
-                    # Verify command line arguments for chatgpt session-based CLI
-                    call_args = mock_popen.call_args[0][0]
-                    assert "--timeout" in call_args
-                    assert "--headless" not in call_args
-                    assert "--remove-cache" not in call_args
-                    if debug:
-                        assert "--debug" in call_args
-                    else:
-                        assert "--debug" not in call_args
+        provider = SimpleProvider("chatgpt", "chatgpt_cli.js", persistent=True)
+        provider.ask("Hello")
+        provider.close()
+
+        proc.stdin.close.assert_called_once()
+        proc.wait.assert_called_once()
+        assert provider._proc is None
 
 
 class TestSimpleProviderErrors:
     """Test SimpleProvider error handling"""
 
-    @patch("subprocess.Popen")
-    def test_ask_stdout_none_error(self, mock_popen):
+    def test_ask_stdout_none_error(self, mock_popen, mock_proc, provider):
         """Test subprocess stdout is None"""
-        mock_proc = MagicMock()
         mock_proc.stdout = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         with pytest.raises(RuntimeError, match="stdout is None"):
             provider.ask("test")
 
-    @patch("subprocess.Popen")
-    def test_ask_no_json_in_output(self, mock_popen):
+    def test_ask_no_json_in_output(self, mock_popen, mock_proc, provider):
         """Test no JSON response in output"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b"some output without json"
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b"some output without json")
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         with pytest.raises(RuntimeError, match="did not produce JSON response"):
             provider.ask("test")
 
-    @patch("subprocess.Popen")
-    def test_ask_unicode_decode_error_handling(self, mock_popen):
+    def test_ask_unicode_decode_error_handling(self, mock_popen, mock_proc, provider):
         """Test UTF-8 decode error with replacement"""
-        mock_proc = MagicMock()
         # Simulate invalid UTF-8 bytes that will be replaced
         invalid_bytes = b'{"response": "test\xff\xfe"}'
-        mock_proc.stdout.read.return_value = invalid_bytes
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(invalid_bytes)
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         # Should handle gracefully with errors='replace'
         result = provider.ask("test")
         assert "test" in result
 
-    @patch("subprocess.Popen")
-    def test_ask_empty_response_value(self, mock_popen):
+    def test_ask_empty_response_value(self, mock_popen, mock_proc, provider):
         """Test empty response value in JSON"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": ""}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(b'{"response": ""}')
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         # extract_response_json returns empty string, not error
         result = provider.ask("test")
         assert result == ""
 
-    @patch("subprocess.Popen")
-    def test_ask_multiple_json_lines(self, mock_popen):
+    def test_ask_multiple_json_lines(self, mock_popen, mock_proc, provider):
         """Test output with multiple JSON lines - uses last one"""
-        mock_proc = MagicMock()
         output = b'debug line\n{"response": "first response"}\n{"response": "second response"}'
-        mock_proc.stdout.read.return_value = output
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
+        mock_proc.stdout = io.BytesIO(output)
 
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         result = provider.ask("test")
         # Provider finds last JSON line while iterating, so returns last response
         assert result == "second response"
@@ -224,51 +316,29 @@ class TestSimpleProviderErrors:
 class TestSimpleProviderCommandBuilding:
     """Test command building in SimpleProvider"""
 
-    @patch("subprocess.Popen")
-    def test_command_structure(self, mock_popen):
+    def test_command_structure(self, mock_popen, provider):
         """Test command structure and argument order"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "test"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         provider.ask("my prompt")
 
         call_args = mock_popen.call_args[0][0]
         assert call_args[0] == "node"
-        assert "--prompt" in call_args
-        assert "my prompt" in call_args
+        args = set(call_args)
+        assert _CHATGPT_BASE_ARGS | {"my prompt"} <= args
         # New session-based CLI does not accept --headless/--remove-cache
-        assert "--headless" not in call_args
-        assert "--remove-cache" not in call_args
-        assert "--timeout" in call_args
+        assert args.isdisjoint(_LEGACY_ONLY_FLAGS)
+        assert mock_popen.call_args.kwargs["bufsize"] == -1
 
-    @patch("subprocess.Popen")
-    def test_debug_flag_included_when_true(self, mock_popen):
+    def test_debug_flag_included_when_true(self, mock_popen, provider):
         """Test debug flag is included when debug=True"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "test"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         provider.ask("test", debug=True)
 
-        call_args = mock_popen.call_args[0][0]
+        call_args = set(mock_popen.call_args[0][0])
         # For session-based chatgpt CLI debug is a flag (no value)
         assert "--debug" in call_args
         assert "true" not in call_args
 
-    @patch("subprocess.Popen")
-    def test_debug_flag_not_included_when_false(self, mock_popen):
+    def test_debug_flag_not_included_when_false(self, mock_popen, provider):
         """Test debug flag is not included when debug=False"""
-        mock_proc = MagicMock()
-        mock_proc.stdout.read.return_value = b'{"response": "test"}'
-        mock_proc.wait.return_value = None
-        mock_popen.return_value.__enter__.return_value = mock_proc
-
-        provider = SimpleProvider("chatgpt", "chatgpt_cli.js")
         provider.ask("test", debug=False)
 
         call_args = mock_popen.call_args[0][0]
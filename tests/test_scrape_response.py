@@ -0,0 +1,50 @@
+import json
+import pytest
+from textgenhub.utils import scrape_response
+from textgenhub.utils.scrape_response import extract_response_json
+
+
+@pytest.fixture(params=["msgspec", "json"])
+def decoder(request, monkeypatch):
+    """Run each test through the msgspec fast path and the stdlib json fallback"""
+    if request.param == "msgspec":
+        if scrape_response.msgspec is None:
+            pytest.skip("msgspec is not installed")
+    else:
+        monkeypatch.setattr(scrape_response, "msgspec", None)
+    return request.param
+
+
+class TestExtractResponseJson:
+    """Test extract_response_json behaves the same with and without msgspec"""
+
+    @pytest.mark.parametrize(
+        "stdout, expected",
+        [
+            ('{"response": "plain answer"}', "plain answer"),
+            ('[INFO] log line\n  {"response": "after logs"}  \n{"response": "ignored"}', "after logs"),
+            ('{"response": "ChatGPT said: hello"}', "hello"),
+            ('{"response": "  chatgpt SAID:\\n  hello  "}', "hello"),
+            ('{"response": "unicode \\u00e9\\u4e2d"}', "unicode é中"),
+            ('{"response": ""}', ""),
+        ],
+    )
+    def test_extracts_response(self, decoder, stdout, expected):
+        """Test the response field is returned with the ChatGPT prefix stripped"""
+        assert extract_response_json(stdout) == expected
+
+    @pytest.mark.parametrize("stdout", ['{"response": {"html": "<p>x</p>"}}', '{"response": 1}', '{"response": null}'])
+    def test_non_string_response_falls_back_to_json(self, decoder, stdout):
+        """Test a non-string response reaches the json path and fails the same way"""
+        with pytest.raises(TypeError):
+            extract_response_json(stdout)
+
+    def test_invalid_json_raises(self, decoder):
+        """Test a malformed response line raises json's decode error"""
+        with pytest.raises(json.JSONDecodeError):
+            extract_response_json('{"response": not json}')
+
+    def test_no_response_line_raises(self, decoder):
+        """Test stdout without a response line raises ValueError"""
+        with pytest.raises(ValueError, match="No valid JSON response"):
+            extract_response_json('{"event": "prompt_sent"}\nplain text')